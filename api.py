@@ -1,23 +1,38 @@
-from fastapi import FastAPI, HTTPException, Query, Depends, status
+from fastapi import FastAPI, HTTPException, Query, Depends, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, StreamingResponse
+import orjson
 from pydantic import BaseModel
 import pandas as pd
+import numpy as np
 from sheets import get_client, SHEET_URL, get_officer_map
 from datetime import datetime, timedelta
 import logging
 import asyncio
 import os
+import pickle
+import zlib
 
 # Auth Imports
 from auth import verify_admin, create_access_token, verify_password
 
 # --- CONFIG ---
 CACHE_DURATION_SECONDS = 60 # Cache data for 1 minute
-CACHE = {"data": None, "timestamp": None}
+# All derived read-path state lives in one "snap" dict that is swapped in
+# with a single assignment, so requests never see half of an old refresh
+# and half of a new one.
+_EMPTY_SNAP = {"version": 0, "nrows": 0, "cols": {}, "idx": {},
+               "search_idx": {}, "filters": {}, "stats": {}}
+CACHE = {"data": None, "timestamp": None, "version": 0, "snap": _EMPTY_SNAP}
 
-app = FastAPI(title="Grievance Monitoring API")
+# Memoized /api/works results per (cache version, filter params); cleared
+# implicitly when the version bumps on refresh.
+_WORKS_MEMO = {}
+
+# orjson (Rust) serializer handles the big list-of-dicts payloads
+# (/api/works, /api/locations) several times faster than stdlib json.
+app = FastAPI(title="Grievance Monitoring API", default_response_class=ORJSONResponse)
 
 class LoginRequest(BaseModel):
     username: str
@@ -35,10 +50,74 @@ app.add_middleware(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# --- ETAG / 304 REVALIDATION ---
+# The data endpoints only change when the sheet cache refreshes, so an ETag
+# keyed on (cache version, query string) lets clients revalidate for free
+# instead of re-downloading identical payloads.
+_ETAG_PATHS = frozenset({"/api/works", "/api/locations", "/api/stats", "/api/filters"})
+
+@app.middleware("http")
+async def etag_middleware(request: Request, call_next):
+    if request.method != "GET" or request.url.path not in _ETAG_PATHS:
+        return await call_next(request)
+
+    # crc32, not builtin hash(): per-process hash randomization would make
+    # ETags unstable across restarts and workers
+    query_digest = zlib.crc32(request.url.query.encode())
+    etag = f'W/"{CACHE["version"]}-{query_digest:08x}"'
+    if request.headers.get("if-none-match") == etag:
+        # The handler is what normally triggers the stale-while-revalidate
+        # refresh; short-circuiting without it would freeze a polling client
+        # on 304s forever. Revalidate the cache, then re-check the version.
+        await get_cached_dataframe()
+        etag = f'W/"{CACHE["version"]}-{query_digest:08x}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+    response = await call_next(request)
+    # Recompute: the handler may have done a cold-start refresh mid-request
+    response.headers["ETag"] = f'W/"{CACHE["version"]}-{query_digest:08x}"'
+    response.headers["Cache-Control"] = f"max-age={CACHE_DURATION_SECONDS}"
+    return response
+
 # --- SERVE FRONTEND ---
+
+class HashedStaticFiles(StaticFiles):
+    """StaticFiles for Vite's content-hashed assets.
+
+    The filenames embed a content hash, so browsers can cache them forever
+    (no revalidation round-trip), and precompressed .br/.gz siblings from the
+    build step are served as-is instead of compressing on the fly.
+    """
+
+    _IMMUTABLE = "public, max-age=31536000, immutable"
+
+    async def get_response(self, path, scope):
+        import mimetypes
+        from starlette.datastructures import Headers
+        accept = Headers(scope=scope).get("accept-encoding", "")
+
+        for enc, ext in (("br", ".br"), ("gzip", ".gz")):
+            if enc in accept and os.path.exists(os.path.join(self.directory, path + ext)):
+                response = await super().get_response(path + ext, scope)
+                if response.status_code == 200:
+                    # Keep the content type of the original file, not the blob
+                    ctype, _ = mimetypes.guess_type(path)
+                    if ctype:
+                        response.headers["Content-Type"] = ctype
+                    response.headers["Content-Encoding"] = enc
+                    response.headers["Vary"] = "Accept-Encoding"
+                    response.headers["Cache-Control"] = self._IMMUTABLE
+                return response
+
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = self._IMMUTABLE
+        return response
+
 # Mount static files (JS/CSS)
 if os.path.exists("dashboard/dist"):
-    app.mount("/assets", StaticFiles(directory="dashboard/dist/assets"), name="assets")
+    app.mount("/assets", HashedStaticFiles(directory="dashboard/dist/assets"), name="assets")
 
 @app.get("/")
 def read_root():
@@ -59,45 +138,236 @@ def read_root():
         "tip": "Check Build Logs for npm errors."
     }
 
+# --- OPTIONAL: SHARED REDIS CACHE ---
+# With multiple Uvicorn workers, each process would otherwise hit Google
+# Sheets independently and lose its cache on restart. If REDIS_URL is set,
+# the pickled DataFrame is shared: one worker wins the refresh lock (SET NX)
+# and the rest read its result.
+REDIS_URL = os.getenv("REDIS_URL")
+_redis = None
+if REDIS_URL:
+    try:
+        import redis.asyncio as aioredis
+        _redis = aioredis.from_url(REDIS_URL)
+    except Exception as e:
+        logging.error(f"Redis unavailable, falling back to in-process cache: {e}")
+        _redis = None
+
 # --- CACHING LOGIC ---
-def get_cached_dataframe():
-    """Fetches data from Google Sheets with caching."""
-    global CACHE
+_REFRESH_LOCK = asyncio.Lock()
+
+def _fetch_sheet_df():
+    """Blocking fetch from Google Sheets. Runs in the executor, never on the loop."""
+    client = get_client()
+    if not client:
+        raise Exception("Google Sheets Auth Failed")
+
+    sheet = client.open_by_url(SHEET_URL).sheet1
+    # Raw values.get instead of get_all_records(): skips gspread's row-by-row
+    # dict construction that we'd immediately flatten into a DataFrame anyway.
+    # UNFORMATTED_VALUE returns numbers as floats, so to_numeric is a no-op.
+    raw = sheet.get('A:R', value_render_option='UNFORMATTED_VALUE')
+    if not raw:
+        df = pd.DataFrame()
+    else:
+        header, *rows = raw
+        width = len(header)
+        # Sheets trims trailing empty cells per row; pad back to header width
+        rows = [r + [''] * (width - len(r)) if len(r) < width else r[:width] for r in rows]
+        df = pd.DataFrame(rows, columns=header)
+
+    # Normalize Columns
+    # Expects: Ticket ID, Timestamp, Category, Severity, Status, Officer, Description, Lat, Long, Photo URL, Map Link, Integrity Metric
+    if not df.empty and 'Lat' in df.columns and 'Long' in df.columns:
+        df['Lat'] = pd.to_numeric(df['Lat'], errors='coerce')
+        df['Long'] = pd.to_numeric(df['Long'], errors='coerce')
+
+    # Low-cardinality string columns -> categorical: one int8 code per cell
+    # instead of a PyObject pointer, so the resident frame shrinks and any
+    # equality compare on these columns is a vectorized code scan.
+    for c in ("Category", "Status", "Severity", "Officer"):
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
+
+def _install_df(df):
+    """Builds the derived state for a fresh DataFrame and swaps it into CACHE."""
+    # --- SoA Cache (Structure of Arrays) ---
+    # The sheet is read-only between refreshes, so materialize column
+    # ndarrays + value -> row-id indexes ONCE here. Filter endpoints then
+    # intersect small precomputed id sets instead of copying/masking the
+    # whole DataFrame on every request.
+    snap = {"version": CACHE["version"] + 1, "nrows": len(df)}
+    snap["cols"] = {c: df[c].to_numpy() for c in df.columns}
+    idx = {}
+    for col in ("Category", "Status", "Severity", "Officer"):
+        if col in df.columns:
+            arr = df[col].astype(str).to_numpy()
+            idx[col] = {val: np.flatnonzero(arr == val) for val in np.unique(arr)}
+    snap["idx"] = idx
+
+    # Case-insensitive search index: lowercase once here so the ?search=
+    # path is a vectorized np.char.find over contiguous arrays instead of a
+    # per-request regex scan of every cell. dtype='U' matters: astype(str)
+    # yields object arrays, which np.char functions reject.
+    def _lower(col):
+        if col in df.columns:
+            return np.char.lower(df[col].astype(str).to_numpy(dtype='U'))
+        return np.empty(0, dtype='U1')
+    snap["search_idx"] = {
+        "id_lower": _lower('Ticket ID'),
+        "desc_lower": _lower('Description'),
+    }
+
+    # Precompute /api/filters and /api/stats here — the data changes at most
+    # once per refresh, so re-scanning unique values per request was wasted work.
+    def _unique(col):
+        if col in df.columns:
+            return sorted([str(x) for x in df[col].unique() if str(x).strip()])
+        return []
+    snap["filters"] = {
+        "categories": _unique("Category"),
+        "severities": _unique("Severity"),
+        "statuses": _unique("Status"),
+        "officers": _unique("Officer")
+    }
+
+    status_counts = df['Status'].value_counts().to_dict() if 'Status' in df.columns else {}
+    total = len(df)
+    resolved = status_counts.get("Resolved", 0)
+    snap["stats"] = {
+        "total": int(total),
+        "open": int(total - resolved),
+        "resolved": int(resolved),
+        "breakdown": status_counts
+    }
+
+    # Swap: this single reference assignment is what makes refresh safe.
+    # Requests read CACHE["snap"] exactly once, so an in-flight request
+    # keeps the old arrays end-to-end instead of intersecting old row-ids
+    # against new, shorter columns mid-refresh.
+    CACHE["snap"] = snap
+    CACHE["data"] = df
+    CACHE["timestamp"] = datetime.now()
+    CACHE["version"] = snap["version"]
+    _WORKS_MEMO.clear()
+    logger.info("Cache refreshed from Google Sheets")
+
+def _fetch_and_cache():
+    df = _fetch_sheet_df()
+    _install_df(df)
+    return df
+
+async def _refresh_via_redis():
+    """Refresh through the shared Redis copy; only the lock winner hits Sheets."""
+    blob = await _redis.get("grievance_cache")
+    if blob is not None:
+        _install_df(pickle.loads(blob))
+        return
+
+    # Leader election: the SET NX winner pulls from Sheets and publishes,
+    # everyone else re-reads the shared copy shortly after.
+    if await _redis.set("grievance_refresh_lock", "1", nx=True, ex=30):
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(None, _fetch_and_cache)
+        await _redis.set(
+            "grievance_cache",
+            pickle.dumps(df, pickle.HIGHEST_PROTOCOL),
+            ex=CACHE_DURATION_SECONDS,
+        )
+    elif CACHE["data"] is None:
+        # Cold start while another worker refreshes: poll for its result —
+        # a Sheets pull routinely takes several seconds, so a single fixed
+        # wait would leave this worker with no cache at all.
+        for _ in range(20):
+            await asyncio.sleep(0.5)
+            blob = await _redis.get("grievance_cache")
+            if blob is not None:
+                _install_df(pickle.loads(blob))
+                return
+        # The leader died or is stuck past its lock TTL; pull directly
+        # rather than serving errors with an empty cache.
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(None, _fetch_and_cache)
+        await _redis.set(
+            "grievance_cache",
+            pickle.dumps(df, pickle.HIGHEST_PROTOCOL),
+            ex=CACHE_DURATION_SECONDS,
+        )
+
+async def _refresh_cache():
+    """Single-flight refresh: only one task hits Sheets, the rest piggyback."""
+    if _REFRESH_LOCK.locked():
+        # Someone else is already refreshing; wait for them instead of
+        # hammering the Google API N times (thundering herd).
+        async with _REFRESH_LOCK:
+            if CACHE["data"] is None:
+                # The leader's fetch failed — fail loudly here too instead
+                # of letting this caller run against an empty cache.
+                raise RuntimeError("Cache refresh failed in a concurrent request")
+            return
+    async with _REFRESH_LOCK:
+        if _redis is not None:
+            await _refresh_via_redis()
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _fetch_and_cache)
+
+async def get_cached_dataframe():
+    """Fetches data from Google Sheets with caching (stale-while-revalidate)."""
     now = datetime.now()
-    
-    # Return cache if valid
+
     if CACHE["data"] is not None and CACHE["timestamp"]:
-        if (now - CACHE["timestamp"]).total_seconds() < CACHE_DURATION_SECONDS:
+        age = (now - CACHE["timestamp"]).total_seconds()
+        if age < CACHE_DURATION_SECONDS:
             return CACHE["data"]
+        # Stale: serve it immediately, refresh in the background
+        if not _REFRESH_LOCK.locked():
+            asyncio.create_task(_background_refresh())
+        return CACHE["data"]
 
-    # Fetch Fresh
+    # Cold start: nothing cached yet, caller has to wait for the fetch
+    await _refresh_cache()
+    if CACHE["data"] is None:
+        raise RuntimeError("Cache refresh completed without data")
+    return CACHE["data"]
+
+async def _background_refresh():
     try:
-        client = get_client()
-        if not client:
-            raise Exception("Google Sheets Auth Failed")
-            
-        sheet = client.open_by_url(SHEET_URL).sheet1
-        data = sheet.get_all_records() # Returns list of dicts
-        df = pd.DataFrame(data)
-        
-        # Normalize Columns
-        # Expects: Ticket ID, Timestamp, Category, Severity, Status, Officer, Description, Lat, Long, Photo URL, Map Link, Integrity Metric
-        if not df.empty and 'Lat' in df.columns and 'Long' in df.columns:
-            df['Lat'] = pd.to_numeric(df['Lat'], errors='coerce')
-            df['Long'] = pd.to_numeric(df['Long'], errors='coerce')
-        
-        CACHE["data"] = df
-        CACHE["timestamp"] = now
-        logger.info("Cache refreshed from Google Sheets")
-        return df
+        await _refresh_cache()
+    except Exception as e:
+        # Keep serving the stale cache; the next cycle will retry.
+        logger.error(f"Background Cache Refresh Error: {e}")
+
+@app.on_event("startup")
+async def prewarm_cache():
+    """Pre-warm so the first real request doesn't eat the full Sheets pull."""
+    try:
+        await _refresh_cache()
     except Exception as e:
-        logger.error(f"Data Fetch Error: {e}")
-        if CACHE["data"] is not None:
-             return CACHE["data"]
-        # Allow returning empty DF instead of crashing if persistent error?
-        # Better to bubble up so we know it failed, but for Frontend it's better to show empty than crash?
-        # Let's re-raise to see error in debug endpoint.
-        raise e
+        logger.error(f"Cache Pre-warm Failed: {e}")
+
+def _row_from_cols(cols, i):
+    """One API record from the cached column arrays (NaN -> None for JSON)."""
+    row = {}
+    for c, arr in cols.items():
+        v = arr[i]
+        if isinstance(v, np.generic):
+            # Unbox numpy scalars (np.float64 etc.) — orjson's default
+            # render refuses them, so /api/works would 500 on coordinates
+            v = v.item()
+        if isinstance(v, float) and v != v: # NaN check
+            v = None
+        row[c] = v
+    return row
+
+def _records_from_cols(cols, ids):
+    """
+    Builds API records from cached column arrays in a single pass.
+    Replaces the old df.where(pd.notnull) + to_dict(orient='records') pattern,
+    which materialized a full object-dtype copy and then re-scanned it.
+    """
+    return [_row_from_cols(cols, i) for i in ids]
 
 # --- ENDPOINTS ---
 
@@ -133,40 +403,16 @@ def debug_auth():
 
 
 @app.get("/api/stats")
-def get_stats():
-    df = get_cached_dataframe()
-    total = len(df)
-    
-    # Status Counts
-    if 'Status' in df.columns:
-        status_counts = df['Status'].value_counts().to_dict()
-    else:
-        status_counts = {}
-        
-    resolved = status_counts.get("Resolved", 0)
-    open_tickets = total - resolved
-    
-    return {
-        "total": int(total),
-        "open": int(open_tickets),
-        "resolved": int(resolved),
-        "breakdown": status_counts
-    }
+async def get_stats():
+    # Precomputed at cache-refresh time; the await just triggers refresh if stale
+    await get_cached_dataframe()
+    return CACHE["snap"]["stats"]
 
 @app.get("/api/filters")
-def get_filters():
-    df = get_cached_dataframe()
-    def get_unique(col):
-        if col in df.columns:
-            return sorted([str(x) for x in df[col].unique() if str(x).strip()])
-        return []
-
-    return {
-        "categories": get_unique("Category"),
-        "severities": get_unique("Severity"),
-        "statuses": get_unique("Status"),
-        "officers": get_unique("Officer")
-    }
+async def get_filters():
+    # Precomputed at cache-refresh time; the endpoint is now a dict lookup
+    await get_cached_dataframe()
+    return CACHE["snap"]["filters"]
 
 @app.get("/api/officers")
 def get_officer_details():
@@ -174,52 +420,89 @@ def get_officer_details():
     return get_officer_map()
 
 @app.get("/api/works") # Keeping name 'works' to match frontend, or 'grievances'
-def get_grievances(
+async def get_grievances(
+    request: Request,
     category: str = Query(None),
     status: str = Query(None),
     severity: str = Query(None),
     officer: str = Query(None),
     search: str = Query(None)
 ):
-    df = get_cached_dataframe().copy()
-    
-    # Filters
-    if category: df = df[df['Category'] == category]
-    if status: df = df[df['Status'] == status]
-    if severity: df = df[df['Severity'] == severity]
-    if officer: df = df[df['Officer'] == officer]
-    
+    await get_cached_dataframe()
+    # One snapshot read per request: every array and index below comes from
+    # this dict, so a concurrent refresh can't mix old and new state.
+    snap = CACHE["snap"]
+    # Large result sets can be streamed row-by-row as NDJSON (one JSON object
+    # per line) instead of buffering the full list: O(1) TTFB and peak memory.
+    want_ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+
+    # Serve the memoized result if this exact filter combo was already
+    # computed against the current cache version
+    memo_key = (snap["version"], category, status, severity, officer, search)
+    if not want_ndjson:
+        hit = _WORKS_MEMO.get(memo_key)
+        if hit is not None:
+            return hit
+
+    # Filters: intersect precomputed row-id sets (built at cache refresh).
+    # No .copy(), no repeated boolean-mask scans over the whole frame.
+    ids = np.arange(snap["nrows"])
+    empty = np.empty(0, dtype=np.intp)
+    for col, val in (("Category", category), ("Status", status),
+                     ("Severity", severity), ("Officer", officer)):
+        if val:
+            ids = np.intersect1d(ids, snap["idx"].get(col, {}).get(val, empty), assume_unique=True)
+
     if search:
-        # Search in ID, Description, Category
-        mask = (
-            df['Ticket ID'].astype(str).str.contains(search, case=False, na=False) |
-            df['Description'].str.contains(search, case=False, na=False)
-        )
-        df = df[mask]
-    
-    # Convert to API format (list of dicts)
-    # Handle NaN for JSON serialization
-    df = df.where(pd.notnull(df), None)
-    return df.to_dict(orient='records')
+        # Search in ID, Description via the precomputed lowercase index
+        q = search.lower()
+        sidx = snap["search_idx"]
+        mask = (np.char.find(sidx["id_lower"], q) >= 0) | (np.char.find(sidx["desc_lower"], q) >= 0)
+        ids = np.intersect1d(ids, np.flatnonzero(mask), assume_unique=True)
+
+    cols = snap["cols"]
+    if want_ndjson:
+        def gen():
+            for i in ids:
+                yield orjson.dumps(_row_from_cols(cols, i), option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+        return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+    # Assemble dicts only for the surviving rows, straight off the cached
+    # column arrays
+    out = _records_from_cols(cols, ids)
+    if len(_WORKS_MEMO) > 128: # Safety cap for pathological param spreads
+        _WORKS_MEMO.clear()
+    _WORKS_MEMO[memo_key] = out
+    return out
 
 @app.get("/api/locations")
-def get_locations():
+async def get_locations():
     """Lightweight endpoint for Map View."""
-    df = get_cached_dataframe()
+    df = await get_cached_dataframe()
     # Filter valid coordinates
     valid_geo = df.dropna(subset=['Lat', 'Long'])
-    
+
+    # Pull raw column arrays once and zip them — avoids the per-row Series
+    # boxing that iterrows() does (the dominant cost on big sheets).
+    ids = valid_geo['Ticket ID'].to_numpy()
+    lats = valid_geo['Lat'].to_numpy()
+    lngs = valid_geo['Long'].to_numpy()
+    cats = valid_geo['Category'].to_numpy()
+    sevs = valid_geo['Severity'].to_numpy()
+    stats = valid_geo['Status'].to_numpy()
+    descs = valid_geo['Description'].to_numpy() # Short description for tooltip
+
     return [
         {
-            "id": row.get("Ticket ID"),
-            "lat": row.get("Lat"),
-            "lng": row.get("Long"),
-            "category": row.get("Category"),
-            "severity": row.get("Severity"),
-            "status": row.get("Status"),
-            "desc": row.get("Description") # Short description for tooltip
+            "id": i,
+            "lat": float(la),
+            "lng": float(ln),
+            "category": c,
+            "severity": s,
+            "status": st,
+            "desc": d
         }
-        for _, row in valid_geo.iterrows()
+        for i, la, ln, c, s, st, d in zip(ids, lats, lngs, cats, sevs, stats, descs)
     ]
 
 # --- IMAGE PROXY ---
@@ -1,11 +1,13 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import jwt, JWTError
+import jwt  # PyJWT: much lighter HS256 path than python-jose
 from passlib.context import CryptContext
+import hmac
 import os
 
 # CONFIG
 SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_fallback_key_change_in_prod")
+_KEY = SECRET_KEY.encode() # Pre-encoded once so each token encode skips the str->bytes hop
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 Hours
 
@@ -15,6 +17,10 @@ ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Hash the admin password ONCE at startup — bcrypt is ~100ms per call,
+# so hashing per-login would be both slow and a DoS vector.
+ADMIN_HASH = pwd_context.hash(ADMIN_PASSWORD)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -29,11 +35,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=15)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, _KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def verify_admin(username, password):
-    """Simple check against env vars."""
-    if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
-        return True
-    return False
+    """Checks credentials against the env-configured admin.
+
+    Username compare is constant-time (no timing side-channel) and the
+    password is verified against the startup-computed bcrypt hash instead
+    of a plaintext ==.
+    """
+    # Compare as bytes: compare_digest only takes ASCII str, so a non-ASCII
+    # username would raise instead of just failing the login
+    return hmac.compare_digest(username.encode(), ADMIN_USERNAME.encode()) and pwd_context.verify(password, ADMIN_HASH)
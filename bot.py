@@ -1,16 +1,31 @@
 import os
+import re
+import sys
 import logging
 import asyncio
 import hashlib
 import time
+import itertools
+from collections import deque
+from cachetools import TTLCache, LRUCache
 from datetime import datetime, timedelta
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
+from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InputMediaPhoto, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler, CallbackQueryHandler, AIORateLimiter
+from telegram.request import HTTPXRequest
+from sheets import get_officer_map, log_tickets, update_ticket_status, get_ticket_meta, update_ticket_rating
 import google.generativeai as genai
 from PIL import Image
+import imagehash
 import io
 import json
-import requests
+import httpx
+
+try:
+    # C-implemented parser, 2-5x stdlib json on small objects
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # --- CONFIGURATION ---
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8577255418:AAF2h6C0ICMs4IuaweH_5OnSNyWOxYCKQQ4")
@@ -18,10 +33,77 @@ GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
 TEST_OFFICER_CHAT_ID = 579438947 # Hardcoded for Testing
 TEST_MODE = True
 
+# Shared pooled HTTP client for photo downloads — keep-alive + HTTP/2 saves
+# a TCP/TLS handshake per photo vs opening a fresh connection each time.
+HTTP = httpx.AsyncClient(http2=True, timeout=30.0)
+
+async def _close_http(app):
+    await HTTP.aclose()
+
 # --- TRIAGE CONFIG ---
-MAX_REPORTS_PER_HOUR = 100 
-RATE_LIMIT_STORE = {} 
-DUPLICATE_HASHES = set() 
+# Both stores are TTL-bounded: a long-running bot would otherwise keep every
+# user and every photo hash forever (unbounded RSS growth).
+MAX_REPORTS_PER_HOUR = 100
+MAX_PHOTO_BYTES = 10 * 1024 * 1024
+
+# Ticket IDs: message_id is per-chat and collides across chats, so use a
+# process-local monotonic counter seeded from the clock (unique across
+# restarts too, as long as we stay under ~1 ticket/sec average).
+_TICKET_SEQ = itertools.count(int(time.time()))
+
+# Tickets queue here and a single background worker flushes them in batches
+# via append_rows — one Sheets write per batch instead of per ticket.
+_TICKET_QUEUE: asyncio.Queue = asyncio.Queue()
+_FLUSH_BATCH_SIZE = 50
+_FLUSH_INTERVAL_SECONDS = 2
+
+async def _ticket_flush_loop():
+    while True:
+        batch = [await _TICKET_QUEUE.get()]
+        while len(batch) < _FLUSH_BATCH_SIZE:
+            try:
+                batch.append(_TICKET_QUEUE.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        try:
+            await asyncio.to_thread(log_tickets, batch)
+        except Exception as e:
+            logging.error(f"Ticket Flush Error: {e}")
+        await asyncio.sleep(_FLUSH_INTERVAL_SECONDS) # Pace writes against the quota
+
+async def _start_ticket_flusher(app):
+    app.create_task(_ticket_flush_loop())
+
+async def _drain_ticket_queue(app):
+    """Shutdown flush: whatever is still queued goes out in one last batch
+    instead of dying with the process."""
+    batch = []
+    while True:
+        try:
+            batch.append(_TICKET_QUEUE.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    if batch:
+        try:
+            await asyncio.to_thread(log_tickets, batch)
+        except Exception as e:
+            logging.error(f"Shutdown Flush Error: {e}")
+
+async def _on_shutdown(app):
+    await _drain_ticket_queue(app)
+    await _close_http(app)
+RATE_LIMIT_STORE = TTLCache(maxsize=50_000, ttl=3600)   # idle users drop after an hour
+DUPLICATE_HASHES = TTLCache(maxsize=200_000, ttl=86400) # used as a set: hash -> 1
+
+# Perceptual near-dup detection: 64-bit dHash fingerprints of accepted photos.
+# Catches the same pothole re-encoded/re-compressed, which byte hashing misses.
+# deque(maxlen=...) keeps the Hamming scan bounded.
+DHASH_FINGERPRINTS = deque(maxlen=10_000)
+DHASH_DISTANCE_THRESHOLD = 6
+
+# Matches "...Ticket: #TKT-123..." OR "...Ticket ID: #TKT-123..." in officer
+# replies. Compiled once — the handler runs per officer photo.
+_TICKET_RE = re.compile(r"Ticket(?: ID)?:\s*#?(TKT-\d+)", re.IGNORECASE)
 
 # Configure Logging
 logging.basicConfig(
@@ -31,47 +113,159 @@ logging.basicConfig(
 
 # Configure Gemini
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-flash-latest')
 
 # --- STATES ---
 LOCATION = 1
 
+# --- PREBUILT OBJECTS (immutable for the process lifetime) ---
+LOCATION_KEYBOARD = ReplyKeyboardMarkup(
+    [[KeyboardButton(text="📍 Share Current Location", request_location=True)]],
+    one_time_keyboard=True,
+    resize_keyboard=True
+)
+
+# PROMPT: acts as the "Bouncer"
+_BOUNCER_PROMPT = """
+        Analyze this image strictly for a Public Grievance System.
+
+        Phase 1: FORENSIC & RELEVANCE CHECK (The Bouncer)
+
+        1. ANTI-SPOOFING CHECK (Digital Screen Detection):
+           - Look closely for **Moiré patterns** (wavy interference lines typical when photographing screens).
+           - Look for **visible pixel grids** or RGB sub-pixels.
+           - Look for **Screen Bezels**, monitor frames, or laptop edges bordering the image.
+           - IF ANY OF ABOVE FOUND -> REJECT immediately. Reason: "Photo of a digital screen detected."
+
+        2. CONTENT RELEVANCE CHECK:
+           - Is this a REAL LIFE photo of a public infrastructure issue (pothole, garbage, broken light, water leak)?
+           - REJECT IF: Selfie, meme, screenshot, text document, blurry/unclear, indoor residential, or unrelated object.
+
+        - Return "is_valid": false if rejected by either check.
+
+        Phase 2: ANALYSIS (If Valid)
+        - Identify Category: ['Sanitation', 'Drainage', 'Water Supply', 'Road Infra', 'Lighting', 'Fire', 'Other']
+        - Map strictly:
+          * Garbage/Trash -> Sanitation
+          * Pothole/Broken Road -> Road Infra
+          * Water Leak/Pipe Burst -> Water Supply
+          * Street Light -> Lighting
+          * Clogged Drain -> Drainage
+          * Fire Hazards -> Fire
+          * Else -> Other
+        - Severity: [High, Medium, Low]
+        - Description: 1 sentence summary.
+
+        OUTPUT FORMAT: JSON ONLY
+        {
+            "is_valid": boolean,
+            "rejection_reason": "string (only if false, strictly polite)",
+            "category": "string",
+            "severity": "string",
+            "description": "string"
+        }
+        """
+
+_GEN_CFG = {"response_mime_type": "application/json"}
+
+# The bouncer prompt is pinned as the model's system instruction, so each
+# generate_content call ships only the image part. (CachedContent would cut
+# server-side prompt processing too, but has a minimum cached-token size far
+# above this prompt — not worth the extra TTL management here.)
+model = genai.GenerativeModel('gemini-flash-latest', system_instruction=_BOUNCER_PROMPT)
+
 # --- MOCK DATABASE & OFFICERS ---
 # --- MOCK DATABASE & OFFICERS ---
 # Officers are now fetched dynamically from Google Sheets
 
+# --- CATEGORY NORMALIZATION ---
+# Canonical categories the officer map is keyed on (must match the prompt)
+VALID_CATEGORIES = {'Sanitation', 'Drainage', 'Water Supply', 'Road Infra', 'Lighting', 'Fire', 'Other'}
+
+# Keyword -> category table, built once at import. One linear pass over the
+# text instead of re-running ad-hoc substring checks per message.
+_CATEGORY_KEYWORDS = (
+    ("garbage", "Sanitation"),
+    ("trash", "Sanitation"),
+    ("pothole", "Road Infra"),
+    ("road", "Road Infra"),
+    ("drain", "Drainage"),
+    ("sewage", "Drainage"),
+    ("water", "Water Supply"),
+    ("pipe", "Water Supply"),
+    ("light", "Lighting"),
+    ("fire", "Fire"),
+)
+
+def normalize_category(category: str, description: str = "") -> str:
+    """Maps a free-text category from Gemini back onto the canonical set."""
+    if category in VALID_CATEGORIES:
+        return category
+    text = f"{category} {description}".lower()
+    for kw, cat in _CATEGORY_KEYWORDS:
+        if kw in text:
+            return cat
+    return "Other"
+
 # --- HELPERS: INTEGRITY CHECKS ---
 
 def check_rate_limit(user_id: int) -> bool:
-    """Returns True if user is allowed, False if rate limited."""
+    """Returns True if user is allowed, False if rate limited.
+
+    Token bucket: each user carries (tokens, last_ts) — two floats instead of
+    a timestamp history. Tokens refill at MAX_REPORTS_PER_HOUR per hour up to
+    the cap, and every accepted photo spends one. O(1) per call, no scan.
+    """
     now = time.time()
-    history = RATE_LIMIT_STORE.get(user_id, [])
-    # Keep only timestamps within last 1 hour (3600 seconds)
-    valid_history = [t for t in history if now - t < 3600]
-    
-    if len(valid_history) >= MAX_REPORTS_PER_HOUR:
+    tokens, last_ts = RATE_LIMIT_STORE.get(user_id, (float(MAX_REPORTS_PER_HOUR), now))
+    tokens = min(MAX_REPORTS_PER_HOUR, tokens + (now - last_ts) * MAX_REPORTS_PER_HOUR / 3600)
+
+    if tokens < 1:
+        RATE_LIMIT_STORE[user_id] = (tokens, now)
         return False
-    
-    valid_history.append(now)
-    RATE_LIMIT_STORE[user_id] = valid_history
+
+    RATE_LIMIT_STORE[user_id] = (tokens - 1, now)
     return True
 
-def get_image_hash(image_bytes: bytes) -> str:
-    """Returns MD5 hash of image bytes for duplicate detection."""
-    return hashlib.md5(image_bytes).hexdigest()
+def get_image_hash(image) -> bytes:
+    """Hash of the decoded pixel buffer, for exact-duplicate detection.
 
-def get_address_details(lat, lon):
+    Hashing the encoded file misses re-shares where a gallery app re-saved
+    the same pixels with different metadata. Hashing image.tobytes() makes
+    the exact check container-proof: same pixels, same hash. BLAKE2b is the
+    fastest hash in the stdlib for multi-MB buffers; the raw 16-byte digest
+    is half the memory of a hex string in DUPLICATE_HASHES.
+    """
+    return hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+
+def is_near_duplicate(fingerprint: int) -> bool:
+    """True if the fingerprint is within Hamming distance of a recent photo."""
+    return any(bin(fingerprint ^ seen).count('1') <= DHASH_DISTANCE_THRESHOLD
+               for seen in DHASH_FINGERPRINTS)
+
+# Two citizens reporting the same block shouldn't cost two Nominatim calls:
+# cache by lat/lon rounded to 4 decimals (~11 m buckets)
+_GEO_CACHE = LRUCache(maxsize=4096)
+
+async def get_address_details(lat, lon):
     """
     Reverse Geocodes Lat/Lon to get Pin Code and Area.
     Uses OpenStreetMap Nominatim API (Free).
+    Runs on the shared pooled async client — no worker-thread hop, and the
+    TLS connection to Nominatim is reused across tickets.
     """
+    geo_key = (round(lat, 4), round(lon, 4))
+    cached = _GEO_CACHE.get(geo_key)
+    if cached is not None:
+        return cached
+
     try:
         url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}"
         headers = {'User-Agent': 'PublicGrievanceBot/1.0 (jayantnahata@example.com)'}
-        response = requests.get(url, headers=headers, timeout=5)
-        
+        response = await HTTP.get(url, headers=headers, timeout=5)
+
         if response.status_code == 200:
-            data = response.json()
+            # Decode raw bytes directly — skips httpx's str round-trip
+            data = _json_loads(response.content)
             address = data.get('address', {})
             
             pincode = address.get('postcode', '')
@@ -88,10 +282,12 @@ def get_address_details(lat, lon):
                 "Unknown Area"
             )
             
-            return {"pincode": pincode, "area": area}
+            result = {"pincode": pincode, "area": area}
+            _GEO_CACHE[geo_key] = result # Only successful lookups are cached
+            return result
     except Exception as e:
         logging.error(f"Geocoding Error: {e}")
-    
+
     return {"pincode": "", "area": ""}
 
 # --- BOT FUNCTIONS ---
@@ -120,54 +316,64 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     """Send a help message."""
     await update.message.reply_text("Just send a photo of the grievance! I'll handle the rest.")
 
-async def analyze_image_with_bouncer(image_bytes):
-    """Sends image to Gemini for Triage (Relevance Check) + Analysis."""
+def _sniff_mime(image_bytes) -> str:
+    """Cheap magic-byte sniff so the common path can skip a full decode."""
+    if image_bytes[:2] == b"\xff\xd8":
+        return "image/jpeg"
+    if image_bytes[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/jpeg"
+
+# Above this, decode + downscale is worth it; below, raw bytes go straight out
+_DOWNSCALE_THRESHOLD_BYTES = 1 * 1024 * 1024
+
+def _prepare_photo(image_bytes):
+    """Single decode pass: exact pixel hash + dHash fingerprint + Gemini payload.
+
+    The JPEG decode is the expensive part on big photos, so dedup and
+    analysis share ONE decode instead of each reopening the bytes. Blocking —
+    always call via asyncio.to_thread.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    img_hash = get_image_hash(image)
+    fingerprint = int(str(imagehash.dhash(image, hash_size=8)), 16)
+
+    if len(image_bytes) > _DOWNSCALE_THRESHOLD_BYTES:
+        # Big upload: downscale before shipping it to Gemini — the bouncer
+        # only needs ~1024px to spot moire/bezels and classify. Cuts upload
+        # bytes (and billed vision tokens) roughly 4-10x.
+        image.thumbnail((1024, 1024), Image.LANCZOS)
+        buf = io.BytesIO()
+        image.convert("RGB").save(buf, "JPEG", quality=80, optimize=True)
+        image_part = {"mime_type": "image/jpeg", "data": buf.getvalue()}
+    else:
+        # Common case (Telegram pre-compresses photos to ~1280px): hand the
+        # raw bytes to Gemini and skip the re-encode entirely
+        image_part = {"mime_type": _sniff_mime(image_bytes), "data": bytes(image_bytes)}
+
+    return img_hash, fingerprint, image_part
+
+# Cap in-flight Gemini requests: past the API quota, extra concurrency just
+# queues server-side as 429s/tail latency. 8 matches the free-tier QPS.
+_GEMINI_SEM = asyncio.Semaphore(8)
+
+def _analyze_sync(image_part):
+    """Blocking Gemini round-trip. Must run off the event loop."""
+    response = model.generate_content([image_part], generation_config=_GEN_CFG)
+    return _json_loads(response.text)
+
+async def analyze_image_with_bouncer(image_part):
+    """Sends the prepared image part to Gemini for Triage (Relevance Check) + Analysis.
+
+    The SDK call is blocking, so it runs in a worker thread — otherwise one
+    slow photo stalls every other user on the event loop. The semaphore keeps
+    a photo burst from fanning out past the Gemini quota.
+    """
     try:
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # PROMPT: acts as the "Bouncer"
-        prompt = """
-        Analyze this image strictly for a Public Grievance System.
-        
-        Phase 1: FORENSIC & RELEVANCE CHECK (The Bouncer)
-        
-        1. ANTI-SPOOFING CHECK (Digital Screen Detection):
-           - Look closely for **Moiré patterns** (wavy interference lines typical when photographing screens).
-           - Look for **visible pixel grids** or RGB sub-pixels.
-           - Look for **Screen Bezels**, monitor frames, or laptop edges bordering the image.
-           - IF ANY OF ABOVE FOUND -> REJECT immediately. Reason: "Photo of a digital screen detected."
-
-        2. CONTENT RELEVANCE CHECK:
-           - Is this a REAL LIFE photo of a public infrastructure issue (pothole, garbage, broken light, water leak)?
-           - REJECT IF: Selfie, meme, screenshot, text document, blurry/unclear, indoor residential, or unrelated object.
-        
-        - Return "is_valid": false if rejected by either check.
-
-        Phase 2: ANALYSIS (If Valid)
-        - Identify Category: ['Sanitation', 'Drainage', 'Water Supply', 'Road Infra', 'Lighting', 'Fire', 'Other']
-        - Map strictly:
-          * Garbage/Trash -> Sanitation
-          * Pothole/Broken Road -> Road Infra
-          * Water Leak/Pipe Burst -> Water Supply
-          * Street Light -> Lighting
-          * Clogged Drain -> Drainage
-          * Fire Hazards -> Fire
-          * Else -> Other
-        - Severity: [High, Medium, Low]
-        - Description: 1 sentence summary.
-
-        OUTPUT FORMAT: JSON ONLY
-        {
-            "is_valid": boolean,
-            "rejection_reason": "string (only if false, strictly polite)",
-            "category": "string",
-            "severity": "string",
-            "description": "string"
-        }
-        """
-        
-        response = model.generate_content([prompt, image], generation_config={"response_mime_type": "application/json"})
-        return json.loads(response.text)
+        async with _GEMINI_SEM:
+            return await asyncio.to_thread(_analyze_sync, image_part)
     except Exception as e:
         logging.error(f"AI Error: {e}")
         return None
@@ -181,23 +387,41 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         await update.message.reply_text("⚠️ <b>Rate Limit Exceeded.</b>\nYou have sent too many reports recently. Please try again in an hour.", parse_mode='HTML')
         return ConversationHandler.END
 
+    # Check: Size guard — reject oversized payloads in O(1) BEFORE paying for
+    # download + hash + decode + Gemini (anti-spam / anti-DoS)
+    largest = update.message.photo[-1]
+    if largest.file_size and largest.file_size > MAX_PHOTO_BYTES:
+        await update.message.reply_text("⚠️ Photo too large. Please send a photo under 10 MB.")
+        return ConversationHandler.END
+
     status_msg = await update.message.reply_text("🧐 Analyzing and validating your photo... Please wait.")
-    
+
     try:
-        photo_file = await update.message.photo[-1].get_file()
-        photo_bytes = await photo_file.download_as_bytearray()
+        photo_file = await largest.get_file()
+        # Download over the shared pooled client (file_path is the full URL)
+        resp = await HTTP.get(photo_file.file_path)
+        resp.raise_for_status()
+        photo_bytes = resp.content
         
         # Store File ID for later use (Sending to Officer)
         context.user_data['photo_file_id'] = photo_file.file_id
         
-        # Check 2: Duplicate Detection
-        img_hash = get_image_hash(photo_bytes)
+        # Check 2: Duplicate Detection — one decode feeds the exact pixel
+        # hash, the perceptual fingerprint and the Gemini payload.
+        img_hash, fingerprint, image_part = await asyncio.to_thread(_prepare_photo, photo_bytes)
+
+        # 2a: Exact re-upload (pixel hash — immune to metadata rewrites)
         if img_hash in DUPLICATE_HASHES:
             await status_msg.edit_text("⚠️ <b>Duplicate Detected.</b>\nWe have already processed this exact photo.", parse_mode='HTML')
             return ConversationHandler.END
-        
+
+        # 2b: Near-duplicate (perceptual dHash)
+        if is_near_duplicate(fingerprint):
+            await status_msg.edit_text("⚠️ <b>Duplicate Detected.</b>\nThis photo looks identical to one we already processed.", parse_mode='HTML')
+            return ConversationHandler.END
+
         # 3. Analyze with "Bouncer"
-        analysis = await analyze_image_with_bouncer(photo_bytes)
+        analysis = await analyze_image_with_bouncer(image_part)
         
         if not analysis:
             await status_msg.edit_text("❌ Technical Error analyzing image. Please try again.")
@@ -209,22 +433,27 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
             await status_msg.edit_text(f"❌ <b>Image Rejected</b>\n\n{reason}\n\n<i>Please upload a clear photo of a public infrastructure issue.</i>", parse_mode='HTML')
             return ConversationHandler.END
 
-        # If Valid -> Mark hash as processed
-        DUPLICATE_HASHES.add(img_hash)
+        # If Valid -> Mark hashes as processed
+        DUPLICATE_HASHES[img_hash] = 1
+        DHASH_FINGERPRINTS.append(fingerprint)
         context.user_data['analysis'] = analysis # Store JSON
 
-        # 4. Ask for Location
-        location_keyboard = [[KeyboardButton(text="📍 Share Current Location", request_location=True)]]
-        reply_markup = ReplyKeyboardMarkup(location_keyboard, one_time_keyboard=True, resize_keyboard=True)
-        
-        await status_msg.edit_text(
+        # Warm the officer map NOW, so the Sheets round-trip hides behind the
+        # user's next tap and handle_location can await a finished task
+        context.user_data['officer_task'] = asyncio.create_task(asyncio.to_thread(get_officer_map))
+
+        # 4. Ask for Location — ONE outgoing message instead of edit+reply
+        # (halves the per-photo hit on the bot-wide send limit). edit_text
+        # can't carry a reply keyboard, so delete the placeholder instead
+        # (fire-and-forget) and put everything in a single reply.
+        asyncio.create_task(status_msg.delete())
+        await update.message.reply_html(
             f"✅ <b>Issue Verified: {analysis['category']}</b>\n\n"
             f"📝 {analysis['description']}\n\n"
-            "📍 <b>Step 2:</b> Please share your **Location** to finalize.",
-            parse_mode='HTML'
+            "📍 <b>Step 2:</b> Share your location below 👇",
+            reply_markup=LOCATION_KEYBOARD
         )
-        await update.message.reply_text("Click below to share location 👇", reply_markup=reply_markup)
-        
+
         return LOCATION
 
     except Exception as e:
@@ -247,16 +476,26 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return LOCATION
 
+    # Kick off geocoding NOW so the Nominatim round-trip overlaps the officer
+    # map lookup instead of running after it.
+    geo_task = asyncio.create_task(get_address_details(lat, lon))
+
     analysis = context.user_data.get('analysis', {})
     photo_file_id = context.user_data.get('photo_file_id') # From handle_photo
-    category = analysis.get('category', 'Other')
     severity = analysis.get('severity', 'Medium')
     description = analysis.get('description', 'No description available.')
+    # Snap any off-list category back onto the canonical set so officer
+    # lookup doesn't silently fall through to General_Admin
+    category = normalize_category(analysis.get('category', 'Other'), description)
     
     # Dynamic Officer Lookup
     try:
-        from sheets import get_officer_map, log_ticket
-        officer_map = get_officer_map()
+        # Usually prefetched by handle_photo; falls back to a fresh fetch
+        officer_task = context.user_data.pop('officer_task', None)
+        if officer_task is not None:
+            officer_map = await officer_task
+        else:
+            officer_map = await asyncio.to_thread(get_officer_map)
         # ... (Officer Lookup Logic Same)
         category_data = officer_map.get(category, {})
         assigned_officer = category_data.get("L1", "General_Admin")
@@ -265,15 +504,11 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         assigned_officer = "General_Admin (Fallback)"
     
     map_link = f"https://www.google.com/maps?q={lat},{lon}"
-    ticket_id = f"TKT-{update.message.message_id}"
-    
-    # --- GEOCODING ---
-    # Run in thread to avoid blocking? It uses requests (blocking). 
-    # Better to run in thread or use async client. 
-    # For simplicity/speed in this context, we'll run it synchronously or slightly block.
-    # Given it's one call, it's okay, but let's wrap in to_thread for safety.
-    geo_info = await asyncio.to_thread(get_address_details, lat, lon)
+    ticket_id = f"TKT-{next(_TICKET_SEQ)}"
     
+    # --- GEOCODING (started above; usually already resolved by now) ---
+    geo_info = await geo_task
+
     # --- LOG TO SHEETS ---
     ticket_data = {
         "ticket_id": ticket_id,
@@ -290,28 +525,27 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         "pincode": geo_info.get("pincode"),
         "area": geo_info.get("area")
     }
-    # Run in background so it doesn't block the bot
-    asyncio.create_task(asyncio.to_thread(log_ticket, ticket_data))
+    # Enqueue for the batch flusher — non-blocking, coalesced into append_rows
+    _TICKET_QUEUE.put_nowait(ticket_data)
     
-    # --- NOTIFY OFFICER (Test Mode) ---
+    # --- NOTIFY OFFICER (Test Mode) + CONFIRM TO CITIZEN ---
+    # The two sends are independent, so they run concurrently: the citizen's
+    # confirmation isn't queued behind the officer's send round-trip.
+    sends = []
     if TEST_MODE and TEST_OFFICER_CHAT_ID:
-        try:
-            officer_msg = (
-                f"🚨 <b>New Grievance Assigned!</b>\n"
-                f"🎫 <b>Ticket:</b> #{ticket_id}\n"
-                f"📂 <b>Category:</b> {category}\n"
-                f"📍 <b>Area:</b> {geo_info.get('area')} ({geo_info.get('pincode')})\n"
-                f"📝 <b>Desc:</b> {description}\n\n"
-                f"👉 <b>Action:</b> Reply to this message with a <b>PHOTO</b> to mark as RESOLVED."
-            )
-            # Send PHOTO + Caption
-            if photo_file_id:
-                await context.bot.send_photo(chat_id=TEST_OFFICER_CHAT_ID, photo=photo_file_id, caption=officer_msg, parse_mode='HTML')
-            else:
-                await context.bot.send_message(chat_id=TEST_OFFICER_CHAT_ID, text=officer_msg, parse_mode='HTML')
-                
-        except Exception as e:
-            logging.error(f"Failed to notify officer: {e}")
+        officer_msg = (
+            f"🚨 <b>New Grievance Assigned!</b>\n"
+            f"🎫 <b>Ticket:</b> #{ticket_id}\n"
+            f"📂 <b>Category:</b> {category}\n"
+            f"📍 <b>Area:</b> {geo_info.get('area')} ({geo_info.get('pincode')})\n"
+            f"📝 <b>Desc:</b> {description}\n\n"
+            f"👉 <b>Action:</b> Reply to this message with a <b>PHOTO</b> to mark as RESOLVED."
+        )
+        # Send PHOTO + Caption
+        if photo_file_id:
+            sends.append(context.bot.send_photo(chat_id=TEST_OFFICER_CHAT_ID, photo=photo_file_id, caption=officer_msg, parse_mode='HTML'))
+        else:
+            sends.append(context.bot.send_message(chat_id=TEST_OFFICER_CHAT_ID, text=officer_msg, parse_mode='HTML'))
 
     response_text = (
         f"✅ <b>Ticket Registered Successfully!</b>\n\n"
@@ -323,9 +557,12 @@ async def handle_location(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         f"🎫 <b>Ticket ID:</b> #{ticket_id}\n\n"
         f"<i>We have notified the designated officer.</i>"
     )
-    
-    await update.message.reply_html(response_text, reply_markup=None)
-    
+    sends.append(update.message.reply_html(response_text, reply_markup=None))
+
+    for result in await asyncio.gather(*sends, return_exceptions=True):
+        if isinstance(result, Exception):
+            logging.error(f"Ticket notification send failed: {result}")
+
     return ConversationHandler.END
 
 async def handle_officer_reply(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -342,9 +579,7 @@ async def handle_officer_reply(update: Update, context: ContextTypes.DEFAULT_TYP
 
     # Extract Ticket ID
     try:
-        # Expected: "...Ticket: #TKT-123..." OR "...Ticket ID: #TKT-123..."
-        import re
-        match = re.search(r"Ticket(?: ID)?:\s*#?(TKT-\d+)", original_text, re.IGNORECASE)
+        match = _TICKET_RE.search(original_text)
         if not match:
             await msg.reply_text("❌ Could not find Ticket ID in the message you replied to.")
             return
@@ -355,7 +590,6 @@ async def handle_officer_reply(update: Update, context: ContextTypes.DEFAULT_TYP
         photo_file = await msg.photo[-1].get_file()
         after_file_id = photo_file.file_id
         
-        from sheets import update_ticket_status, get_ticket_meta
         success = await asyncio.to_thread(update_ticket_status, ticket_id, "Resolved", after_file_id)
         
         if success:
@@ -369,7 +603,6 @@ async def handle_officer_reply(update: Update, context: ContextTypes.DEFAULT_TYP
                 
                 try:
                     # 1. Send Visual Proof (Before & After)
-                    from telegram import InputMediaPhoto
                     media = []
                     if before_file_id:
                         media.append(InputMediaPhoto(media=before_file_id, caption="BEFORE"))
@@ -378,7 +611,6 @@ async def handle_officer_reply(update: Update, context: ContextTypes.DEFAULT_TYP
                     await context.bot.send_media_group(chat_id=citizen_id, media=media)
                     
                     # 2. Ask for Rating
-                    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
                     keyboard = [
                         [
                             InlineKeyboardButton("⭐ 1", callback_data=f"rate_{ticket_id}_1"),
@@ -418,7 +650,6 @@ async def handle_rating_callback(update: Update, context: ContextTypes.DEFAULT_T
     try:
         _, ticket_id, score = data.split('_')
         
-        from sheets import update_ticket_rating
         await asyncio.to_thread(update_ticket_rating, ticket_id, score)
         
         await query.edit_message_text(f"🌟 <b>Thank you for rating us {score} Stars!</b>", parse_mode='HTML')
@@ -434,7 +665,34 @@ def main() -> None:
         print("ERROR: Please update the TELEGRAM_BOT_TOKEN in the script.")
         return
 
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # libuv event loop: ~2x throughput on socket-heavy asyncio workloads, and
+    # this process is pure I/O (Telegram + Gemini + Sheets + Nominatim).
+    # Optional: no uvloop on Windows, and the stdlib loop works fine for dev.
+    if sys.platform != 'win32':
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
+    # Large keep-alive pool so concurrent handlers reuse TLS connections to
+    # the Bot API instead of paying a handshake per send. getUpdates gets its
+    # own instance (PTB requires separate request objects).
+    request = HTTPXRequest(connection_pool_size=256, read_timeout=20, connect_timeout=5)
+    updates_request = HTTPXRequest(connection_pool_size=8, read_timeout=30, connect_timeout=5)
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(64) # Updates fan out as tasks instead of serializing
+        # Queue outbound sends client-side just under Telegram's ~30 msg/s cap
+        # so bursts don't trigger cascading 429s
+        .rate_limiter(AIORateLimiter(overall_max_rate=28, overall_time_period=1, max_retries=3))
+        .request(request)
+        .get_updates_request(updates_request)
+        .post_init(_start_ticket_flusher)
+        .post_shutdown(_on_shutdown)
+        .build()
+    )
 
     # Conversation Handler with States
     conv_handler = ConversationHandler(
@@ -462,13 +720,27 @@ def main() -> None:
     application.add_handler(MessageHandler(filters.PHOTO & filters.REPLY, handle_officer_reply), group=1)
     
     # Rating Handler
-    from telegram.ext import CallbackQueryHandler
     application.add_handler(CallbackQueryHandler(handle_rating_callback, pattern="^rate_"))
     
     application.add_handler(conv_handler)
 
     # Run the bot
-    application.run_polling()
+    # Webhook mode (push delivery) removes the serial getUpdates long-poll —
+    # sub-second latency under load. Polling stays the default for local dev.
+    public_host = os.getenv("PUBLIC_HOST")
+    if os.getenv("USE_WEBHOOK") and public_host:
+        # Separate WEBHOOK_PORT: on Railway $PORT is already bound by the
+        # uvicorn dashboard in the same container (see start.sh), so the
+        # webhook listener needs its own port behind the proxy.
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=int(os.getenv("WEBHOOK_PORT", 8443)),
+            url_path=TELEGRAM_BOT_TOKEN, # Unguessable path = poor man's auth
+            webhook_url=f"https://{public_host}/{TELEGRAM_BOT_TOKEN}",
+            max_connections=100,
+        )
+    else:
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
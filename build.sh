@@ -8,4 +8,15 @@ npm install
 npm run build
 cd ..
 
+# Precompress hashed assets so the API serves .br/.gz siblings with zero CPU
+if [ -d "dashboard/dist/assets" ]; then
+    echo "Precompressing Assets..."
+    find dashboard/dist/assets -type f \( -name '*.js' -o -name '*.css' -o -name '*.svg' \) | while read -r f; do
+        gzip -k -9 "$f"
+        if command -v brotli > /dev/null; then
+            brotli -q 11 -k "$f"
+        fi
+    done
+fi
+
 echo "Build Complete!"
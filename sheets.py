@@ -1,36 +1,354 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import csv
 import os
 import json
 import logging
+import operator
+import random
+from collections import ChainMap, OrderedDict
+
+try:
+    # C-implemented parser, 2-5x stdlib json — same fallback pattern as bot.py
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+import threading
+import time
 from datetime import datetime
 
 # --- CONFIGURATION ---
 SHEET_URL = "https://docs.google.com/spreadsheets/d/1d0a0lfbMyqFJpnn45kC5jZO2uQbcQkrcHlAF_yaP7qA/edit?usp=sharing"
+# Parsed once: open_by_key skips open_by_url's URL parse + Drive lookup
+_SHEET_ID = SHEET_URL.split('/d/')[1].split('/')[0]
 CREDENTIALS_JSON = os.getenv("GOOGLE_SHEETS_CREDENTIALS") # User must set this in Railway
 
 # Setup Logging
 logger = logging.getLogger(__name__)
 
+# Hot-path constants, built once at import instead of per call
+_SCOPE = ('https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive')
+_HEADERS = ("Ticket ID", "Timestamp", "Category", "Severity", "Status", "Officer", "Description", "Lat", "Long", "Photo URL", "Map Link", "Integrity Metric", "Chat ID", "PhotoID", "After File ID", "User Rating", "Pin Code", "Area")
+
+try:
+    # Parse the service-account key once; a bad blob is logged here instead
+    # of erroring on every get_client() call
+    _CREDS_DICT = _json_loads(CREDENTIALS_JSON) if CREDENTIALS_JSON else None
+except Exception as e:
+    logger.error("Credentials Parse Error: %s", e, exc_info=True)
+    _CREDS_DICT = None
+
+# Module singletons: rebuilding the client per call meant a JSON key parse +
+# fresh OAuth token exchange per ticket operation, and open_by_url is itself
+# an HTTP metadata call. gspread refreshes the token internally when needed.
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+# gspread and its google-auth stack import lazily in get_client(): tens of
+# ms of import cost move off process start, so the bot answers its first
+# non-Sheets update sooner. Every other helper only runs once get_client()
+# has populated these module globals.
+gspread = None
+Credentials = None
+_SPREADSHEET = None
+_SHEET1 = None
+_OFFICER_WS = None
+_HEADERS_VERIFIED = False
+_PRESIZE_ROWS = 100_000
+
 def get_client():
-    """Authenticates with Google Sheets using Service Account."""
-    if not CREDENTIALS_JSON:
+    """Authenticates with Google Sheets using Service Account (cached)."""
+    global _CLIENT, gspread, Credentials
+    if _CLIENT is not None:
+        return _CLIENT
+
+    if not _CREDS_DICT:
         logger.error("GOOGLE_SHEETS_CREDENTIALSEnv Var not found!")
         return None
-    
+
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            return _CLIENT
+        try:
+            if gspread is None:
+                import gspread as _gspread
+                from google.oauth2.service_account import Credentials as _Credentials
+                gspread = _gspread
+                Credentials = _Credentials
+            creds = Credentials.from_service_account_info(_CREDS_DICT, scopes=_SCOPE)
+            _CLIENT = gspread.authorize(creds)
+            return _CLIENT
+        except Exception as e:
+            logger.error("Auth Error: %s", e, exc_info=True)
+            return None
+
+def _invalidate_handles(e):
+    """Drops the cached handles when the API says they went stale (expired
+    auth, revoked share, deleted tab) so the next call rebuilds them lazily.
+    """
+    global _CLIENT, _SPREADSHEET, _SHEET1, _OFFICER_WS
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    if status in (401, 403, 404):
+        _CLIENT = None
+        _SPREADSHEET = None
+        _SHEET1 = None
+        _OFFICER_WS = None
+        logger.warning("Sheets handles invalidated after HTTP %s.", status)
+
+def _get_spreadsheet():
+    """Cached Spreadsheet handle, opened by key (no URL parse, no Drive lookup)."""
+    global _SPREADSHEET
+    if _SPREADSHEET is None:
+        client = get_client()
+        if not client:
+            return None
+        _SPREADSHEET = client.open_by_key(_SHEET_ID)
+    return _SPREADSHEET
+
+def _get_sheet1():
+    """Cached handle to the main ticket worksheet."""
+    global _SHEET1
+    if _SHEET1 is None:
+        ss = _get_spreadsheet()
+        if not ss:
+            return None
+        _SHEET1 = ss.sheet1
+    return _SHEET1
+
+# --- TICKET ROW INDEX ---
+# ticket_id -> sheet row. sheet.find() pulls the whole column over the API
+# and linear-scans it on every status/rating update; this keeps the lookup
+# local. Warmed once from col_values(1), then maintained as batches append.
+TICKET_ROW_INDEX = {}
+_INDEX_WARMED = False
+
+def _find_ticket_row(sheet, ticket_id):
+    """O(1) local lookup of a ticket's sheet row, warming the index on first use."""
+    global _INDEX_WARMED
+    row = TICKET_ROW_INDEX.get(ticket_id)
+    if row is not None:
+        return row
+    if not _INDEX_WARMED:
+        for idx, tid in enumerate(sheet.col_values(1), start=1):
+            if tid:
+                TICKET_ROW_INDEX.setdefault(tid, idx)
+        _INDEX_WARMED = True
+        row = TICKET_ROW_INDEX.get(ticket_id)
+    return row
+
+def _ensure_headers(sheet):
+    """Verifies the header row exists — once per process, via one cell.
+
+    acell('A1') is a single-cell values.get (<1 KB on the wire) instead of
+    pulling and parsing the whole first row; the full-row probe only runs
+    when the sentinel is missing, i.e. on a fresh sheet.
+    """
+    global _HEADERS_VERIFIED
+    if _HEADERS_VERIFIED:
+        return
+    if sheet.acell('A1').value != _HEADERS[0] and not sheet.row_values(1):
+        # Plain range write: row 1 is empty here, so there is nothing to
+        # shift and no reason to pay insert_row's InsertDimension request.
+        # Keyword args — gspread 6.x swapped the positional order.
+        sheet.update(values=[list(_HEADERS)], range_name='A1:R1', value_input_option='RAW')
+
+    # One-time pre-size: appends past the grid edge make Sheets grow the
+    # row dimension as a side transaction per batch. Growing to 100k rows
+    # up front keeps every later append a single values.append call.
+    # (values.get only returns data rows, so reads don't pay for the slack.)
     try:
-        creds_dict = json.loads(CREDENTIALS_JSON)
-        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        client = gspread.authorize(creds)
-        return client
+        if sheet.row_count < _PRESIZE_ROWS:
+            sheet.resize(rows=_PRESIZE_ROWS)
     except Exception as e:
-        logger.error(f"Auth Error: {e}")
-        return None
+        logger.warning("Could not pre-size sheet: %s", e)
 
-def log_ticket(ticket_data):
+    _HEADERS_VERIFIED = True
+
+# Optional fields a ticket dict may omit; ChainMap supplies the defaults so
+# _build_row can use one itemgetter call instead of 13 .get() lookups.
+_ROW_DEFAULTS = {
+    "ticket_id": None, "category": None, "severity": None, "officer": None,
+    "description": None, "lat": None, "long": None, "map_link": None,
+    "photo_url": "N/A", "citizen_chat_id": "", "photo_file_id": "",
+    "pincode": "", "area": ""
+}
+_ROW_GETTER = operator.itemgetter(
+    "ticket_id", "category", "severity", "officer", "description",
+    "lat", "long", "photo_url", "map_link", "citizen_chat_id",
+    "photo_file_id", "pincode", "area"
+)
+
+def _as_float(value):
+    """Coerces a coordinate to a native float, passing through on failure."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def _build_row(ticket_data):
+    """Builds one sheet row from a ticket dict."""
+    (ticket_id, category, severity, officer, description, lat, lon,
+     photo_url, map_link, chat_id, file_id, pincode, area) = _ROW_GETTER(
+        ChainMap(ticket_data, _ROW_DEFAULTS))
+    # Native floats serialize as JSON numbers under RAW input, so Sheets
+    # stores real numerics instead of quoted text it must re-coerce on read
+    lat = _as_float(lat)
+    lon = _as_float(lon)
+    # isoformat with a space separator yields the identical "YYYY-MM-DD
+    # HH:MM:SS" string ~4x cheaper than strftime's format-parsing path
+    timestamp = datetime.now().isoformat(' ', 'seconds')
+    return [
+        ticket_id,
+        timestamp,
+        category,
+        severity,
+        "Open", # Default Status
+        officer,
+        description,
+        lat,
+        lon,
+        photo_url,
+        map_link,
+        "Validated", # Default Integrity
+        chat_id, # Col 13
+        file_id, # Col 14
+        "", # Col 15: After File ID (Empty on creation)
+        "",  # Col 16: User Rating (Empty on creation)
+        pincode, # Col 17
+        area     # Col 18
+    ]
+
+# Transient Sheets failures worth retrying: quota bursts and server errors.
+_RETRY_STATUSES = (429, 500, 502, 503)
+_MAX_ATTEMPTS = 5
+
+def _append_with_backoff(sheet, rows):
+    """append_rows with bounded exponential backoff.
+
+    A dropped batch is a lost grievance, so quota bursts (429) and server
+    errors retry with jittered exponential delays, honouring Retry-After
+    when the API sends one. Anything else propagates immediately.
+    """
+    for attempt in range(_MAX_ATTEMPTS):
+        try:
+            return sheet.append_rows(rows, value_input_option='RAW')
+        except gspread.exceptions.APIError as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if status not in _RETRY_STATUSES or attempt == _MAX_ATTEMPTS - 1:
+                raise
+            delay = min(2 ** attempt + random.random(), 60)
+            retry_after = e.response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = int(retry_after)
+            logger.warning("Sheets append got HTTP %s; retry %d/%d in %.1fs", status, attempt + 1, _MAX_ATTEMPTS, delay)
+            time.sleep(delay)
+
+# Telegram retries and double-taps can hand the flusher the same ticket
+# twice; a bounded LRU of recent IDs short-circuits those before any network
+# call (and before they pollute the sheet).
+_SEEN_TICKETS = OrderedDict()
+_SEEN_MAX = 4096
+
+def _dedup_batch(ticket_batch):
+    """Filters out tickets whose IDs were logged recently."""
+    fresh = []
+    for td in ticket_batch:
+        tid = td.get("ticket_id")
+        if tid in _SEEN_TICKETS:
+            logger.warning("Skipping duplicate ticket %s.", tid)
+            continue
+        _SEEN_TICKETS[tid] = None
+        if len(_SEEN_TICKETS) > _SEEN_MAX:
+            _SEEN_TICKETS.popitem(last=False)
+        fresh.append(td)
+    return fresh
+
+# --- LOCAL WRITE-AHEAD FALLBACK ---
+# When Sheets stays down past the backoff budget, batches park in a local
+# CSV instead of being dropped, and replay after the next successful append.
+_WAL_PATH = os.getenv("TICKET_WAL_PATH", "tickets.wal.csv")
+_WAL_LOCK = threading.Lock()
+
+def _wal_write(rows):
+    """Durably parks rows on local disk when Sheets won't take them."""
+    try:
+        with _WAL_LOCK, open(_WAL_PATH, 'a', newline='') as f:
+            csv.writer(f).writerows(rows)
+        return True
+    except OSError as e:
+        logger.error("WAL Write Error: %s", e, exc_info=True)
+        return False
+
+def _index_appended(resp, ticket_ids):
+    """Records where an appended batch landed so later updates skip sheet.find()."""
+    try:
+        start_cell = resp['updates']['updatedRange'].split('!')[1].split(':')[0]
+        start_row = int(''.join(c for c in start_cell if c.isdigit()))
+        for offset, tid in enumerate(ticket_ids):
+            TICKET_ROW_INDEX[tid] = start_row + offset
+    except (KeyError, TypeError, ValueError, IndexError):
+        pass
+
+def _drain_wal(sheet):
+    """Replays parked rows into Sheets once it is reachable again."""
+    with _WAL_LOCK:
+        try:
+            if not os.path.exists(_WAL_PATH):
+                return
+            with open(_WAL_PATH, newline='') as f:
+                rows = [r for r in csv.reader(f) if r]
+            for r in rows:
+                # CSV round-trips every field as text; restore numeric
+                # lat/long (cols 8-9) so the replay matches a live append
+                if len(r) > 8:
+                    r[7] = _as_float(r[7])
+                    r[8] = _as_float(r[8])
+            if rows:
+                resp = _append_with_backoff(sheet, rows)
+                # Index the replayed rows too (ticket ID is column A) —
+                # the warm-scan only runs once, so rows appended after it
+                # would otherwise be unfindable until a restart.
+                _index_appended(resp, [r[0] for r in rows])
+                logger.info("Drained %d ticket(s) from the local WAL.", len(rows))
+            os.remove(_WAL_PATH)
+        except Exception as e:
+            logger.error("WAL Drain Error: %s", e, exc_info=True)
+
+def log_tickets(ticket_batch):
     """
-    Logs a new ticket to the Google Sheet.
+    Logs a batch of tickets in ONE append_rows call.
+    One API write per batch instead of one per ticket — this is what keeps
+    the bot under the Sheets write quota (100 writes / 100 s) under load.
+    """
+    ticket_batch = _dedup_batch(ticket_batch)
+    if not ticket_batch:
+        return True
+
+    rows = [_build_row(td) for td in ticket_batch]
+
+    sheet = _get_sheet1()
+    if not sheet:
+        return _wal_write(rows)
+
+    try:
+        _ensure_headers(sheet)
+
+        resp = _append_with_backoff(sheet, rows)
+
+        # Record where the batch landed so later updates skip sheet.find()
+        _index_appended(resp, [td.get("ticket_id") for td in ticket_batch])
+
+        logger.debug("%d ticket(s) logged to Sheets.", len(rows))
+        _drain_wal(sheet) # Sheets is reachable again — replay any parked rows
+        return True
+    except Exception as e:
+        _invalidate_handles(e)
+        logger.error("Sheet Write Error: %s", e, exc_info=True)
+        return _wal_write(rows)
+
+def log_ticket(ticket_data):
+    """Logs a single ticket (see log_tickets for the batch path).
+
     ticket_data format:
     {
         "ticket_id": "TKT-123",
@@ -44,98 +362,53 @@ def log_ticket(ticket_data):
         "map_link": "..."
     }
     """
-    client = get_client()
-    if not client:
-        return False
-
-    try:
-        sheet = client.open_by_url(SHEET_URL).sheet1
-        
-        # Ensure Headers Exist
-        headers = ["Ticket ID", "Timestamp", "Category", "Severity", "Status", "Officer", "Description", "Lat", "Long", "Photo URL", "Map Link", "Integrity Metric", "Chat ID", "PhotoID", "After File ID", "User Rating", "Pin Code", "Area"]
-        if sheet.row_values(1) != headers:
-            # If empty or wrong, set headers (Optional: check if first row is empty)
-            if not sheet.row_values(1): 
-                sheet.insert_row(headers, 1)
-
-        # Prepare Row
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        row = [
-            ticket_data.get("ticket_id"),
-            timestamp,
-            ticket_data.get("category"),
-            ticket_data.get("severity"),
-            "Open", # Default Status
-            ticket_data.get("officer"),
-            ticket_data.get("description"),
-            ticket_data.get("lat"),
-            ticket_data.get("long"),
-            ticket_data.get("photo_url", "N/A"),
-            ticket_data.get("map_link"),
-            "Validated", # Default Integrity
-            ticket_data.get("citizen_chat_id", ""), # Col 13
-            ticket_data.get("photo_file_id", ""), # Col 14
-            "", # Col 15: After File ID (Empty on creation)
-            "",  # Col 16: User Rating (Empty on creation)
-            ticket_data.get("pincode", ""), # Col 17
-            ticket_data.get("area", "")     # Col 18
-        ]
-        
-        sheet.append_row(row)
-        logger.info(f"Ticket {ticket_data.get('ticket_id')} logged to Sheets.")
-        return True
-        return True
-    except Exception as e:
-        logger.error(f"Sheet Write Error: {e}")
-        return False
+    return log_tickets([ticket_data])
 
 def update_ticket_status(ticket_id, status, after_photo_url="N/A"):
     """
     Updates the status and after_photo of a ticket by ID.
     Status can be 'Resolved' or 'Closed'.
     """
-    client = get_client()
-    if not client: return False
-    
+    sheet = _get_sheet1()
+    if not sheet: return False
+
     try:
-        sheet = client.open_by_url(SHEET_URL).sheet1
-        # Find cell with Ticket ID
-        cell = sheet.find(ticket_id)
-        if not cell:
-            logger.warning(f"Ticket {ticket_id} not found for update.")
+        row = _find_ticket_row(sheet, ticket_id)
+        if not row:
+            logger.warning("Ticket %s not found for update.", ticket_id)
             return False
-        
+
         # Batch Update for reliability
         # Update Status (Col 5)
         # Update After Photo ID (Col 15)
-        
+
         # We constructed the cell range manually to avoid fetching full row object
         # R1C5 (Status) and R1C15 (AfterID). They are far apart, so batch update list is better.
-        
+
         updates = [
-            {'range': gspread.utils.rowcol_to_a1(cell.row, 5), 'values': [[status]]},
+            {'range': gspread.utils.rowcol_to_a1(row, 5), 'values': [[status]]},
         ]
-        
+
         if after_photo_url and after_photo_url != "N/A":
-            updates.append({'range': gspread.utils.rowcol_to_a1(cell.row, 15), 'values': [[after_photo_url]]})
+            updates.append({'range': gspread.utils.rowcol_to_a1(row, 15), 'values': [[after_photo_url]]})
             
         sheet.batch_update(updates)
 
         return True
     except Exception as e:
-        logger.error(f"Sheet Update Error: {e}")
+        _invalidate_handles(e)
+        logger.error("Sheet Update Error: %s", e, exc_info=True)
         return False
 
 def get_ticket_meta(ticket_id):
     """Fetches Citizen Chat ID and Photo File ID for a ticket."""
-    client = get_client()
-    if not client: return None
+    sheet = _get_sheet1()
+    if not sheet: return None
     try:
-        sheet = client.open_by_url(SHEET_URL).sheet1
-        cell = sheet.find(ticket_id)
-        if not cell: return None
-        
-        row_values = sheet.row_values(cell.row)
+        row = _find_ticket_row(sheet, ticket_id)
+        if not row: return None
+
+        row_values = sheet.row_values(row)
         # Assuming Col 13 is Citizen ID, Col 14 is Photo ID
         # Safety check for list index
         citizen_id = row_values[12] if len(row_values) > 12 else None
@@ -146,22 +419,27 @@ def get_ticket_meta(ticket_id):
             "photo_file_id": photo_id
         }
     except Exception as e:
-        logger.error(f"Meta Fetch Error: {e}")
+        _invalidate_handles(e)
+        logger.error("Meta Fetch Error: %s", e, exc_info=True)
         return None
 
 def update_ticket_rating(ticket_id, rating):
     """Updates the rating (Col 16)."""
-    client = get_client()
-    if not client: return False
+    sheet = _get_sheet1()
+    if not sheet: return False
     try:
-        sheet = client.open_by_url(SHEET_URL).sheet1
-        cell = sheet.find(ticket_id)
-        if not cell: return False
-        
-        sheet.update_cell(cell.row, 16, rating) # Col 16
+        row = _find_ticket_row(sheet, ticket_id)
+        if not row: return False
+
+        # Same values-batch style as update_ticket_status, and leaves room to
+        # piggyback more cells on the same round-trip later.
+        sheet.batch_update([
+            {'range': gspread.utils.rowcol_to_a1(row, 16), 'values': [[rating]]} # Col 16
+        ])
         return True
     except Exception as e:
-        logger.error(f"Rating Update Error: {e}")
+        _invalidate_handles(e)
+        logger.error("Rating Update Error: %s", e, exc_info=True)
         return False
 
 # --- CACHE FOR OFFICERS ---
@@ -170,6 +448,7 @@ OFFICER_CACHE = {
     "timestamp": 0
 }
 CACHE_TTL = 300 # 5 minutes
+_OFFICER_MODIFIED = None # Drive modifiedTime at the last full fetch
 
 def get_officer_map():
     """
@@ -177,65 +456,75 @@ def get_officer_map():
     Schema: Officer_ID, Full_Name, Mobile, Designation, Sector, Zone, Level, Reports_To, Sector_Head_ID
     Returns: { "Category": {"L1": "Name", "L2": "Name", "SLA": 48} }
     """
-    global OFFICER_CACHE
+    global OFFICER_CACHE, _OFFICER_WS, _OFFICER_MODIFIED
     now = time.time()
-    
+
     # Return Cache if valid
     if now - OFFICER_CACHE["timestamp"] < CACHE_TTL and OFFICER_CACHE["data"]:
         return OFFICER_CACHE["data"]
 
-    client = get_client()
-    if not client:
-        return {}
-
     try:
+        if _OFFICER_WS is None:
+            ss = _get_spreadsheet()
+            if not ss:
+                return {}
+            try:
+                _OFFICER_WS = ss.worksheet("Officer Details")
+            except gspread.WorksheetNotFound:
+                logger.warning("'Officer Details' sheet not found! Using fallback.")
+                return {}
+        sheet = _OFFICER_WS
+
+        # Cheap precheck on TTL expiry: one tiny Drive files.get instead of
+        # re-pulling and re-parsing every officer row when nothing changed.
+        # (modifiedTime covers the whole spreadsheet, so ticket appends also
+        # bump it — the precheck mostly pays off during idle periods.)
         try:
-            sheet = client.open_by_url(SHEET_URL).worksheet("Officer Details")
-        except gspread.WorksheetNotFound:
-            logger.warning("'Officer Details' sheet not found! Using fallback.")
-            return {}
+            modified = sheet.spreadsheet.lastUpdateTime
+        except Exception:
+            modified = None
+        if modified and modified == _OFFICER_MODIFIED and OFFICER_CACHE["data"]:
+            OFFICER_CACHE["timestamp"] = now
+            return OFFICER_CACHE["data"]
 
         records = sheet.get_all_records()
         
-        # 1. Build ID Lookup
-        # Officer_ID -> {Name, Level, Reports_To}
-        officer_db = {
-            str(row.get("Officer_ID")): {
-                "name": row.get("Full_Name"),
-                "reports_to": str(row.get("Reports_To")),
-                "level": str(row.get("Level"))
-            } for row in records
-        }
-
-        # 2. Group by Sector (Category)
-        mapping = {}
+        # Single pass: build the ID -> name lookup and collect Level-1 rows
+        # with deferred Reports_To resolution (an L1's manager may appear
+        # later in the sheet), instead of traversing records twice.
+        officer_names = {}
+        l1_rows = []
         for row in records:
-            sector = row.get("Sector")
-            if not sector: continue
-            
+            get = row.get
+            officer_names[str(get("Officer_ID"))] = get("Full_Name")
+
             # Logic: Find the "Ground" officer (Level 1) for this sector
             # If multiple Lv1s exist, this simple logic picks the last one encountered.
             # Ideally obtaining "Zone" from the Ticket would map to specific Lv1.
             # For now, we map Sector -> One Rep.
-            
-            lvl = str(row.get("Level"))
-            if lvl in ["1", "L1", "Field"]:
-                l1_name = row.get("Full_Name")
-                l2_id = str(row.get("Reports_To"))
-                l2_name = officer_db.get(l2_id, {}).get("name", "Unassigned")
-                
-                mapping[sector] = {
-                    "L1": l1_name,
-                    "L2": l2_name,
-                    "SLA": 48 # Default as column is missing
-                }
+            sector = get("Sector")
+            if sector and str(get("Level")) in ("1", "L1", "Field"):
+                l1_rows.append((sector, get("Full_Name"), str(get("Reports_To"))))
+
+        # Resolve L2 names now that every officer is known: one dict lookup
+        # per sector instead of per record.
+        mapping = {
+            sector: {
+                "L1": l1_name,
+                "L2": officer_names.get(l2_id, "Unassigned"),
+                "SLA": 48 # Default as column is missing
+            }
+            for sector, l1_name, l2_id in l1_rows
+        }
         
         # Update Cache
         OFFICER_CACHE["data"] = mapping
         OFFICER_CACHE["timestamp"] = now
-        logger.info(f"Refreshed Officer Map: {len(mapping)} sectors mapped.")
+        _OFFICER_MODIFIED = modified
+        logger.info("Refreshed Officer Map: %d sectors mapped.", len(mapping))
         return mapping
 
     except Exception as e:
-        logger.error(f"Error fetching officer map: {e}")
+        _invalidate_handles(e)
+        logger.error("Error fetching officer map: %s", e, exc_info=True)
         return OFFICER_CACHE.get("data", {})
@@ -18,4 +18,4 @@ python bot.py &
 
 # Start the API in foreground (so Railway keeps the container alive based on this port)
 echo "Starting Dashboard API..."
-uvicorn api:app --host 0.0.0.0 --port $PORT
+uvicorn api:app --host 0.0.0.0 --port $PORT --loop uvloop --http httptools